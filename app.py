@@ -4,11 +4,21 @@ A Gradio-based web UI for transcribing audio files with speaker identification.
 Optimized for CPU-only environments.
 """
 
+# Annotations must stay lazy: module-level signatures mention torch.Tensor,
+# which is only imported on first use via load_backend()
+from __future__ import annotations
+
+import concurrent.futures
+import io
+import itertools
+import logging
 import os
 import tempfile
+import threading
 import time
 from pathlib import Path
 from typing import Optional
+import numpy as np
 import gradio as gr
 from dotenv import load_dotenv
 
@@ -20,10 +30,183 @@ load_dotenv()
 # This env var restores the previous behavior. See: https://github.com/m-bain/whisperX/issues/1304
 os.environ.setdefault("TORCH_FORCE_NO_WEIGHTS_ONLY_LOAD", "1")
 
-# These imports will be available after installing requirements
-import whisperx
-from whisperx.diarize import DiarizationPipeline
-import torch
+# OMP_NUM_THREADS is read by OpenMP/CTranslate2 once at library init, so it must
+# be set before torch/whisperx are imported; mutating it later is a no-op.
+# Configurable via HF_NUM_THREADS in the environment or .env file.
+DEFAULT_NUM_THREADS = int(os.getenv("HF_NUM_THREADS", str(os.cpu_count() or 8)))
+os.environ.setdefault("OMP_NUM_THREADS", str(DEFAULT_NUM_THREADS))
+
+# Long CPU transcriptions are split at silence and run by this many parallel
+# workers. CTranslate2 releases the GIL during compute, so threads scale on
+# multi-core machines without duplicating the model.
+CHUNK_WORKERS = max(1, int(os.getenv("CHUNK_WORKERS", "2")))
+
+# CTranslate2 inter-op workers: lets concurrent transcribe() calls (queued
+# Gradio requests, chunk workers) share one loaded model instead of
+# serializing behind it. The per-call thread count is divided by this so the
+# workers don't oversubscribe the cores.
+CT2_NUM_WORKERS = max(1, int(os.getenv("CT2_NUM_WORKERS", "2")))
+
+# The ML stack (whisperx pulls in torch, faster-whisper, pyannote, CT2) costs
+# several seconds to import, none of which the Gradio UI needs. Import it
+# lazily: create_ui() warms it up in a background thread and transcribe_audio
+# blocks on it before first use.
+_BACKEND_LOCK = threading.Lock()
+_backend_loaded = False
+
+
+def load_backend() -> None:
+    """Import the heavy ML modules into module globals on first call."""
+    global whisperx, DiarizationPipeline, WhisperModel, torch, torchaudio, soundfile
+    global _backend_loaded
+    if _backend_loaded:
+        return
+    with _BACKEND_LOCK:
+        if _backend_loaded:
+            return
+        import whisperx
+        from whisperx.diarize import DiarizationPipeline
+        # whisperx's WhisperModel subclass, not the plain faster-whisper one:
+        # the batched pipeline calls generate_segment_batched, which only the
+        # subclass implements. Its constructor is inherited, so num_workers
+        # and cpu_threads pass through unchanged.
+        from whisperx.asr import WhisperModel
+        import torch
+        import torchaudio
+        import soundfile
+        _backend_loaded = True
+
+
+# Whisper and pyannote both operate on 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+# On-disk cache for serialized models, so a server restart doesn't repeat the
+# HuggingFace hub checks and model rebuilds
+DISK_CACHE_DIR = Path(os.getenv("XDG_CACHE_HOME", str(Path.home() / ".cache"))) / "whisper-transcriber"
+
+# One temp dir for all transcript downloads, created at startup instead of a
+# fresh mkdtemp per request; cleaned up when the process exits
+OUTPUT_DIR = tempfile.TemporaryDirectory(prefix="whisper-transcriber-")
+
+logger = logging.getLogger(__name__)
+
+# Fixed progress checkpoints, precomputed so the inference thread isn't
+# building fresh strings while the CT2 workers hold the cores. Tracebacks go
+# to the log instead of into progress descriptions.
+PROGRESS_LOAD = (0.05, "Loading Whisper model...")
+PROGRESS_TRANSCRIBE = (0.15, "Transcribing audio (this may take a while for long files)...")
+PROGRESS_ALIGN = (0.50, "Aligning transcript...")
+PROGRESS_ALIGN_WARN = (0.50, "Alignment failed, continuing...")
+PROGRESS_DIARIZE_WARN = (0.65, "Diarization failed, continuing without speaker labels...")
+PROGRESS_FORMAT = (0.90, "Formatting output...")
+PROGRESS_SAVE = (0.95, "Saving transcript...")
+PROGRESS_DONE = (1.0, "Complete!")
+
+
+# Model caches: loading Whisper/alignment/diarization models is by far the most
+# expensive part of a request, so keep them resident for the life of the process
+# and reuse them across Gradio invocations. Guarded by a lock since Gradio may
+# serve concurrent requests.
+_ASR_CACHE = {}
+_ALIGN_CACHE = {}
+_DIARIZE_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def get_asr(model_size: str, device: str, compute_type: str, language: str,
+            beam_size: int = 1, cpu_threads: int = 0):
+    """Return a cached WhisperX ASR model, loading it on first use.
+
+    cpu_threads only applies at load time (CTranslate2 fixes its thread pool
+    when the model is built), so it is deliberately not part of the cache key.
+    """
+    key = (model_size, device, compute_type, language, beam_size)
+    with _CACHE_LOCK:
+        if key not in _ASR_CACHE:
+            # Build the CTranslate2 model ourselves: whisperx.load_model does
+            # not expose num_workers, which is what lets concurrent
+            # transcribe() calls share this instance
+            ct2_model = WhisperModel(
+                model_size,
+                device=device,
+                compute_type=compute_type,
+                cpu_threads=max(1, cpu_threads // CT2_NUM_WORKERS) if cpu_threads else 0,
+                num_workers=CT2_NUM_WORKERS,
+            )
+            _ASR_CACHE[key] = whisperx.load_model(
+                model_size,
+                device=device,
+                compute_type=compute_type,
+                language=language,
+                model=ct2_model,
+                # Single deterministic decode; no temperature-fallback re-runs.
+                # beam_size=1 (greedy) does ~5x less decoder work than beam=5
+                # for near-identical accuracy on clean audio.
+                asr_options={
+                    "without_timestamps": False,
+                    "suppress_numerals": False,
+                    "temperatures": [0.0],
+                    "beam_size": beam_size,
+                    "best_of": beam_size,
+                    "patience": 1.0,
+                }
+            )
+        return _ASR_CACHE[key]
+
+
+def get_align(language_code: str, device: str):
+    """Return a cached (model, metadata) pair for forced alignment.
+
+    Warm process starts load the (already quantized) model straight from the
+    local disk cache, skipping whisperx.load_align_model's HuggingFace hub
+    check and the quantization pass.
+    """
+    key = (language_code, device)
+    with _CACHE_LOCK:
+        if key in _ALIGN_CACHE:
+            return _ALIGN_CACHE[key]
+
+        cache_path = DISK_CACHE_DIR / f"align_{language_code}_{device}.pt"
+        if cache_path.exists():
+            try:
+                _ALIGN_CACHE[key] = torch.load(
+                    cache_path, map_location=device, weights_only=False
+                )
+                return _ALIGN_CACHE[key]
+            except Exception:
+                pass  # stale or corrupt cache; fall through to a fresh load
+
+        model_a, metadata = whisperx.load_align_model(
+            language_code=language_code,
+            device=device
+        )
+        if device == "cpu":
+            # Dynamic int8 quantization of the wav2vec2 Linear layers:
+            # roughly 2x faster forced alignment via FBGEMM int8 GEMM and
+            # about a quarter of the FP32 model's RAM
+            model_a = torch.quantization.quantize_dynamic(
+                model_a, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        _ALIGN_CACHE[key] = (model_a, metadata)
+
+        try:
+            DISK_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            torch.save(_ALIGN_CACHE[key], cache_path)
+        except Exception:
+            pass  # cache write is best-effort
+        return _ALIGN_CACHE[key]
+
+
+def get_diarize(hf_token: str, device: str):
+    """Return a cached diarization pipeline for the given token."""
+    key = (hf_token, device)
+    with _CACHE_LOCK:
+        if key not in _DIARIZE_CACHE:
+            _DIARIZE_CACHE[key] = DiarizationPipeline(
+                use_auth_token=hf_token,
+                device=device
+            )
+        return _DIARIZE_CACHE[key]
 
 
 def get_hf_token_from_env() -> Optional[str]:
@@ -33,83 +216,186 @@ def get_hf_token_from_env() -> Optional[str]:
 
 def get_device_and_compute_type():
     """Determine the best device and compute type for the current hardware."""
+    try:
+        import torch
+    except ImportError:
+        return "cpu", "int8"
     if torch.cuda.is_available():
         return "cuda", "float16"
     else:
         return "cpu", "int8"
 
 
-def format_timestamp(seconds: float) -> str:
-    """Convert seconds to HH:MM:SS format."""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    return f"{hours:02d}:{minutes:02d}:{secs:02d}"
+def load_audio_16k(audio_file: str) -> torch.Tensor:
+    """
+    Decode an audio file once into a 16 kHz mono float32 tensor of shape (1, N).
 
+    Decoding and resampling a long file is a full pass over hundreds of MB, so
+    do it exactly once here and share the result between transcription,
+    alignment, and diarization instead of letting each stage re-decode.
 
-def format_transcript_with_speakers(segments: list) -> str:
+    WAV files (the only format the UI accepts) go through libsndfile directly,
+    which avoids FFmpeg context init; other formats fall back to torchaudio.
     """
-    Format transcription segments into readable text with speaker labels and timestamps.
-    
-    Groups consecutive segments by speaker to avoid repetitive labels.
+    if Path(audio_file).suffix.lower() == ".wav":
+        data, sr = soundfile.read(audio_file, dtype="float32", always_2d=False)
+        if data.ndim > 1:
+            data = data.mean(axis=1)
+        wav = torch.from_numpy(data).unsqueeze(0)
+    else:
+        wav, sr = torchaudio.load(audio_file)
+        if wav.shape[0] > 1:
+            wav = wav.mean(dim=0, keepdim=True)
+    if sr != SAMPLE_RATE:
+        wav = torchaudio.functional.resample(wav, sr, SAMPLE_RATE)
+    return wav
+
+
+def split_on_silence(audio: np.ndarray, num_chunks: int) -> list[tuple[float, np.ndarray]]:
     """
-    if not segments:
-        return "No transcription results."
-    
-    lines = []
-    current_speaker = None
-    current_text_parts = []
-    segment_start_time = None
-    
-    for segment in segments:
-        speaker = segment.get("speaker", "UNKNOWN")
-        text = segment.get("text", "").strip()
-        start_time = segment.get("start", 0)
-        
-        if not text:
+    Split audio into roughly equal contiguous chunks for parallel transcription.
+
+    Each cut is placed at the quietest 20 ms window within +/-5 s of the
+    equal-length boundary so words are not bisected. Short files (under a
+    minute per chunk) are returned whole - the parallelism overhead isn't
+    worth it there.
+
+    Returns a list of (offset_seconds, chunk) pairs covering the whole signal.
+    """
+    if num_chunks <= 1 or len(audio) < num_chunks * 60 * SAMPLE_RATE:
+        return [(0.0, audio)]
+
+    window = SAMPLE_RATE // 50  # 20 ms energy windows
+    search = 5 * SAMPLE_RATE
+    boundaries = [0]
+    for i in range(1, num_chunks):
+        target = i * len(audio) // num_chunks
+        lo = max(boundaries[-1], target - search)
+        hi = min(len(audio), target + search)
+        region = audio[lo:hi]
+        n = len(region) // window
+        if n == 0:
+            boundaries.append(target)
             continue
-        
-        # If speaker changed, write out the previous speaker's text
-        if speaker != current_speaker:
-            if current_speaker is not None and current_text_parts:
-                timestamp = format_timestamp(segment_start_time)
-                combined_text = " ".join(current_text_parts)
-                lines.append(f"[{timestamp}] {current_speaker}: {combined_text}")
-            
-            # Start new speaker block
-            current_speaker = speaker
-            current_text_parts = [text]
-            segment_start_time = start_time
-        else:
-            # Same speaker, accumulate text
-            current_text_parts.append(text)
-    
-    # Don't forget the last speaker's text
-    if current_speaker is not None and current_text_parts:
-        timestamp = format_timestamp(segment_start_time)
-        combined_text = " ".join(current_text_parts)
-        lines.append(f"[{timestamp}] {current_speaker}: {combined_text}")
-    
-    return "\n\n".join(lines)
+        energy = np.square(region[: n * window].reshape(n, window)).mean(axis=1)
+        boundaries.append(lo + int(np.argmin(energy)) * window + window // 2)
+    boundaries.append(len(audio))
+
+    return [
+        (start / SAMPLE_RATE, audio[start:end])
+        for start, end in zip(boundaries, boundaries[1:])
+    ]
 
 
-def format_transcript_simple(segments: list) -> str:
+def format_timestamps(times: np.ndarray) -> list[str]:
     """
-    Format transcription without speaker labels (fallback when diarization fails).
+    Convert an array of seconds to HH:MM:SS strings in one vectorized pass.
+
+    The divmod arithmetic runs in numpy for the whole batch, so the Python
+    loop is reduced to string formatting.
     """
-    if not segments:
-        return "No transcription results."
-    
-    lines = []
-    for segment in segments:
-        text = segment.get("text", "").strip()
-        start_time = segment.get("start", 0)
-        
-        if text:
-            timestamp = format_timestamp(start_time)
-            lines.append(f"[{timestamp}] {text}")
-    
-    return "\n\n".join(lines)
+    arr = np.asarray(times, dtype=np.float64)
+    hours = (arr // 3600).astype(np.int32)
+    minutes = ((arr % 3600) // 60).astype(np.int32)
+    secs = (arr % 60).astype(np.int32)
+    return [f"{h:02d}:{m:02d}:{s:02d}" for h, m, s in zip(hours, minutes, secs)]
+
+
+def assign_word_speakers_fast(diarize_segments, result: dict) -> dict:
+    """
+    Assign a speaker to each segment and word via binary search over the
+    diarization turns.
+
+    whisperx.assign_word_speakers intersects every segment with every
+    diarization turn, which is quadratic and noticeable on hours-long audio.
+    Sorting the turns once and locating each word's midpoint with
+    np.searchsorted makes the merge linearithmic. Falls back to the library
+    implementation if the diarization output isn't the expected DataFrame.
+    """
+    try:
+        starts = diarize_segments["start"].to_numpy(dtype=np.float64)
+        ends = diarize_segments["end"].to_numpy(dtype=np.float64)
+        speakers = diarize_segments["speaker"].to_numpy()
+    except Exception:
+        return whisperx.assign_word_speakers(diarize_segments, result)
+
+    order = np.argsort(starts, kind="stable")
+    starts, ends, speakers = starts[order], ends[order], speakers[order]
+
+    def lookup(start: float, end: float):
+        mid = (start + end) / 2.0
+        i = int(np.searchsorted(starts, mid, side="right")) - 1
+        if i >= 0 and mid <= ends[i]:
+            return speakers[i]
+        # Midpoint fell in a diarization gap: take whichever neighbouring
+        # turn overlaps the interval more, if any does.
+        best, best_overlap = None, 0.0
+        for j in (i, i + 1):
+            if 0 <= j < len(starts):
+                overlap = min(end, ends[j]) - max(start, starts[j])
+                if overlap > best_overlap:
+                    best, best_overlap = speakers[j], overlap
+        return best
+
+    for segment in result.get("segments", []):
+        speaker = lookup(segment.get("start", 0.0), segment.get("end", 0.0))
+        if speaker is not None:
+            segment["speaker"] = speaker
+        for word in segment.get("words", []):
+            if "start" in word and "end" in word:
+                word_speaker = lookup(word["start"], word["end"])
+                if word_speaker is not None:
+                    word["speaker"] = word_speaker
+
+    return result
+
+
+def segments_to_arrays(segments: list) -> tuple[np.ndarray, list[str]]:
+    """
+    Pack the segment dict list into a structured array plus a text list.
+
+    The format phase only needs start, speaker, and text. Thousands of
+    scattered per-segment dicts are converted once into one contiguous array
+    (with texts indexed alongside) so the grouping below runs on numpy columns
+    instead of chasing Python objects. Whitespace-only segments are dropped
+    here, matching the old formatters' filter.
+    """
+    spoken = [s for s in segments if s.get("text", "").strip()]
+    arr = np.empty(len(spoken), dtype=[("start", "f4"), ("speaker", "U16")])
+    texts = []
+    for i, s in enumerate(spoken):
+        arr[i] = (s.get("start", 0), s.get("speaker", "UNKNOWN"))
+        texts.append(s["text"].strip())
+    return arr, texts
+
+
+def iter_transcript_with_speakers(arr: np.ndarray, texts: list[str]):
+    """
+    Yield one formatted line per speaker turn, with speaker label and timestamp.
+
+    Groups consecutive segments by speaker to avoid repetitive labels; the
+    run boundaries come from one vectorized comparison on the speaker column.
+    A generator so callers can stream lines straight to a file instead of
+    materializing a multi-MB transcript string twice.
+    """
+    if len(arr) == 0:
+        return
+    speakers = arr["speaker"]
+    starts = np.flatnonzero(np.concatenate(([True], speakers[1:] != speakers[:-1])))
+    ends = np.append(starts[1:], len(arr))
+    timestamps = format_timestamps(arr["start"][starts])
+    for timestamp, i, j in zip(timestamps, starts, ends):
+        yield f"[{timestamp}] {speakers[i]}: {' '.join(texts[i:j])}"
+
+
+def iter_transcript_simple(arr: np.ndarray, texts: list[str]):
+    """
+    Yield one formatted line per segment, without speaker labels
+    (fallback when diarization fails).
+    """
+    timestamps = format_timestamps(arr["start"])
+    for timestamp, text in zip(timestamps, texts):
+        yield f"[{timestamp}] {text}"
 
 
 def transcribe_audio(
@@ -119,11 +405,15 @@ def transcribe_audio(
     min_speakers: Optional[int] = None,
     max_speakers: Optional[int] = None,
     num_threads: int = 8,
+    batch_size: int = 8,
+    language: str = "en",
+    quality: str = "Fast (greedy)",
+    parallel_post: bool = True,
     progress: gr.Progress = gr.Progress()
 ) -> tuple[str, Optional[str]]:
     """
     Transcribe audio file with speaker diarization.
-    
+
     Args:
         audio_file: Path to the audio file
         model_size: Whisper model size (tiny, base, small, medium, large-v3)
@@ -131,6 +421,10 @@ def transcribe_audio(
         min_speakers: Minimum number of speakers (optional)
         max_speakers: Maximum number of speakers (optional)
         num_threads: Number of CPU threads to use
+        batch_size: Number of 30s chunks transcribed per batch (more = faster, more RAM)
+        language: Audio language code; pinning it skips the auto-detect decode pass
+        quality: "Fast (greedy)" for beam_size=1 or "Accurate (beam=5)" for beam search
+        parallel_post: Run alignment and diarization concurrently on two threads
         progress: Gradio progress tracker
     
     Returns:
@@ -138,140 +432,227 @@ def transcribe_audio(
     """
     if not audio_file:
         return "Please upload an audio file.", None
-    
+
+    # No-op if the create_ui() warm-up thread already got here
+    load_backend()
+
     # Check for token: UI input takes precedence, then fall back to env
     env_token = get_hf_token_from_env()
     effective_token = hf_token.strip() if hf_token and hf_token.strip() else env_token
     
-    # Set thread count for CPU inference
-    # OMP_NUM_THREADS controls CTranslate2 (used by faster-whisper/WhisperX)
-    # torch.set_num_threads controls PyTorch operations (alignment, diarization)
-    os.environ["OMP_NUM_THREADS"] = str(num_threads)
+    # torch.set_num_threads controls PyTorch operations (alignment, diarization).
+    # CTranslate2's thread count is fixed at model load time via cpu_threads;
+    # OMP_NUM_THREADS is set once at module import and not touched here.
     torch.set_num_threads(num_threads)
     
     device, compute_type = get_device_and_compute_type()
     
-    progress(0.05, desc="Loading Whisper model...")
+    progress(*PROGRESS_LOAD)
     
+    beam_size = 5 if quality.startswith("Accurate") else 1
+
     try:
-        # Load WhisperX model
-        model = whisperx.load_model(
-            model_size,
-            device=device,
-            compute_type=compute_type,
-            language="en"
-        )
+        # Load WhisperX model (cached across requests)
+        model = get_asr(model_size, device, compute_type, language,
+                        beam_size=beam_size, cpu_threads=num_threads)
     except Exception as e:
         return f"Error loading model: {str(e)}", None
     
-    progress(0.15, desc="Transcribing audio (this may take a while for long files)...")
+    progress(*PROGRESS_TRANSCRIBE)
     
     try:
-        # Load and transcribe audio
-        audio = whisperx.load_audio(audio_file)
-        result = model.transcribe(audio, batch_size=16 if device == "cuda" else 4)
+        # Decode once; WhisperX gets a numpy view, diarization reuses the tensor
+        wav = load_audio_16k(audio_file)
+        audio = wav.squeeze(0).numpy()
+
+        # Whisper's encoder is trained on 30s windows; feeding it a shorter
+        # buffer invites hallucinated text, so zero-pad short clips up front.
+        # (Long audio is already cut into padded 30s chunks via chunk_size.)
+        if len(audio) < 30 * SAMPLE_RATE:
+            audio = np.pad(audio, (0, 30 * SAMPLE_RATE - len(audio)), mode="constant")
+        # Batched inference is the main CTranslate2 throughput lever; chunk_size=30
+        # keeps encoder inputs at Whisper's padded 30s length to avoid hallucinations.
+        # Long CPU files are split at silence and transcribed by parallel workers.
+        chunks = split_on_silence(audio, CHUNK_WORKERS if device == "cpu" else 1)
+
+        def transcribe_chunk(offset: float, chunk_audio: np.ndarray) -> dict:
+            chunk_result = model.transcribe(
+                chunk_audio, batch_size=batch_size, chunk_size=30,
+                language=language, task="transcribe"
+            )
+            for segment in chunk_result["segments"]:
+                segment["start"] += offset
+                segment["end"] += offset
+            return chunk_result
+
+        if len(chunks) > 1:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(chunks)) as ex:
+                chunk_results = list(ex.map(lambda c: transcribe_chunk(*c), chunks))
+            result = {
+                "segments": [s for r in chunk_results for s in r["segments"]],
+                "language": chunk_results[0]["language"],
+            }
+        else:
+            result = model.transcribe(audio, batch_size=batch_size, chunk_size=30,
+                                      language=language, task="transcribe")
     except Exception as e:
         return f"Error during transcription: {str(e)}", None
     
-    progress(0.50, desc="Aligning transcript...")
-    
-    try:
+    def run_align(segments_in: list) -> dict:
         # Align whisper output for better word-level timestamps
-        model_a, metadata = whisperx.load_align_model(
-            language_code="en",
-            device=device
-        )
-        result = whisperx.align(
-            result["segments"],
+        model_a, metadata = get_align(language, device)
+        return whisperx.align(
+            segments_in,
             model_a,
             metadata,
             audio,
             device,
             return_char_alignments=False
         )
-        # Free up memory
-        del model_a
-    except Exception as e:
-        progress(0.50, desc=f"Alignment warning: {str(e)}, continuing...")
-    
-    # Free whisper model memory
-    del model
-    if device == "cuda":
-        torch.cuda.empty_cache()
-    
-    # Attempt speaker diarization if token available (from UI or env)
+
+    def run_diarize():
+        diarize_model = get_diarize(effective_token, device)
+
+        diarize_kwargs = {}
+        if min_speakers and min_speakers > 0:
+            diarize_kwargs["min_speakers"] = min_speakers
+        if max_speakers and max_speakers > 0:
+            diarize_kwargs["max_speakers"] = max_speakers
+
+        # whisperx's wrapper only accepts a path or raw array - it wraps the
+        # array into pyannote's in-memory form itself, so the pre-resampled
+        # 16 kHz audio goes through with no re-decode or resample. Use the
+        # unpadded waveform; the zero padding is only for Whisper's encoder.
+        return diarize_model(wav.squeeze(0).numpy(), **diarize_kwargs)
+
     diarization_success = False
+    diarization_error = None
+    diarize_segments = None
     token_source = None
-    
+
     if effective_token:
         if hf_token and hf_token.strip():
             token_source = "UI input"
         else:
             token_source = ".env file"
-        
-        progress(0.65, desc=f"Performing speaker diarization (token from {token_source})...")
-        
+
+    if effective_token and parallel_post:
+        # Alignment and diarization only meet at the final merge, and both
+        # release the GIL during compute, so overlap them on two threads
+        progress(0.50, desc=f"Aligning and diarizing in parallel (token from {token_source})...")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as ex:
+            align_future = ex.submit(run_align, result["segments"])
+            diarize_future = ex.submit(run_diarize)
+            try:
+                result = align_future.result()
+            except Exception:
+                logger.exception("Alignment failed")
+                progress(*PROGRESS_ALIGN_WARN)
+            try:
+                diarize_segments = diarize_future.result()
+            except Exception as e:
+                diarization_error = str(e)
+                logger.exception("Diarization failed")
+    else:
+        progress(*PROGRESS_ALIGN)
         try:
-            diarize_model = DiarizationPipeline(
-                use_auth_token=effective_token,
-                device=device
-            )
-            
-            diarize_kwargs = {}
-            if min_speakers and min_speakers > 0:
-                diarize_kwargs["min_speakers"] = min_speakers
-            if max_speakers and max_speakers > 0:
-                diarize_kwargs["max_speakers"] = max_speakers
-            
-            diarize_segments = diarize_model(audio, **diarize_kwargs)
-            result = whisperx.assign_word_speakers(diarize_segments, result)
+            result = run_align(result["segments"])
+        except Exception:
+            logger.exception("Alignment failed")
+            progress(*PROGRESS_ALIGN_WARN)
+
+        if effective_token:
+            progress(0.65, desc=f"Performing speaker diarization (token from {token_source})...")
+            try:
+                diarize_segments = run_diarize()
+            except Exception as e:
+                diarization_error = str(e)
+                logger.exception("Diarization failed")
+
+    if diarize_segments is not None:
+        try:
+            result = assign_word_speakers_fast(diarize_segments, result)
             diarization_success = True
-            
-            del diarize_model
-            if device == "cuda":
-                torch.cuda.empty_cache()
-                
         except Exception as e:
             diarization_error = str(e)
-            progress(0.65, desc=f"Diarization failed: {diarization_error}, continuing without speaker labels...")
+            logger.exception("Speaker assignment failed")
 
-    progress(0.90, desc="Formatting output...")
+    if diarization_error:
+        progress(*PROGRESS_DIARIZE_WARN)
 
-    # Format the transcript
-    segments = result.get("segments", [])
+    progress(*PROGRESS_FORMAT)
+
+    # Format lazily: lines are streamed straight into the output file and
+    # mirrored into a StringIO for the Gradio display copy, so the full
+    # transcript is never materialized twice
+    seg_arr, seg_texts = segments_to_arrays(result.get("segments", []))
 
     if diarization_success:
-        transcript = format_transcript_with_speakers(segments)
+        lines = iter_transcript_with_speakers(seg_arr, seg_texts)
     else:
-        transcript = format_transcript_simple(segments)
+        lines = iter_transcript_simple(seg_arr, seg_texts)
+
+    note = None
+    if not diarization_success:
         if not effective_token:
-            transcript = "NOTE: No HuggingFace token provided (neither in UI nor .env file) - speaker diarization disabled.\n\n" + transcript
-        elif 'diarization_error' in locals():
-            transcript = f"NOTE: Speaker diarization failed: {diarization_error}\n\n" + transcript
-    
+            note = "NOTE: No HuggingFace token provided (neither in UI nor .env file) - speaker diarization disabled."
+        elif diarization_error:
+            note = f"NOTE: Speaker diarization failed: {diarization_error}"
+
     # Save to file
-    progress(0.95, desc="Saving transcript...")
-    
-    output_dir = tempfile.mkdtemp()
+    progress(*PROGRESS_SAVE)
+
     input_filename = Path(audio_file).stem
-    output_path = os.path.join(output_dir, f"{input_filename}_transcript.txt")
-    
-    with open(output_path, "w", encoding="utf-8") as f:
+    base = os.path.join(OUTPUT_DIR.name, f"{input_filename}_transcript")
+    output_path = f"{base}.txt"
+
+    # O_EXCL keeps concurrent requests for the same filename from clobbering
+    # each other; the 1 MB buffer turns the save into one or two write() calls
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_CLOEXEC
+    for n in itertools.count(1):
+        try:
+            fd = os.open(output_path, flags, 0o600)
+            break
+        except FileExistsError:
+            output_path = f"{base}_{n}.txt"
+
+    display = io.StringIO()
+
+    with os.fdopen(fd, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write(f"Transcription of: {Path(audio_file).name}\n")
         f.write(f"Model: {model_size}\n")
         f.write(f"Speaker diarization: {'Yes' if diarization_success else 'No'}\n")
         f.write(f"Generated: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
         f.write("=" * 60 + "\n\n")
-        f.write(transcript)
-    
-    progress(1.0, desc="Complete!")
+        if note:
+            f.write(note + "\n\n")
+            display.write(note + "\n\n")
+        wrote_any = False
+        for line in lines:
+            if wrote_any:
+                f.write("\n\n")
+                display.write("\n\n")
+            f.write(line)
+            display.write(line)
+            wrote_any = True
+        if not wrote_any:
+            f.write("No transcription results.")
+            display.write("No transcription results.")
+
+    transcript = display.getvalue()
+
+    progress(*PROGRESS_DONE)
     
     return transcript, output_path
 
 
 def create_ui():
     """Create and configure the Gradio interface."""
-    
+
+    # Warm up the ML imports in the background so the UI is serving in well
+    # under a second and the first real request doesn't pay the import cost
+    threading.Thread(target=load_backend, daemon=True).start()
+
     # Check if token is available from environment
     env_token = get_hf_token_from_env()
     token_from_env = env_token is not None and len(env_token) > 0
@@ -311,6 +692,26 @@ def create_ui():
                     label="Model Size",
                     info="Larger models are more accurate but slower. 'medium' recommended for CPU."
                 )
+
+                language_dropdown = gr.Dropdown(
+                    choices=["en", "de", "es", "fr", "it", "ja", "nl", "pt", "zh"],
+                    value="en",
+                    label="Language",
+                    info="Pinning the language skips Whisper's auto-detection pass."
+                )
+
+                quality_radio = gr.Radio(
+                    choices=["Fast (greedy)", "Accurate (beam=5)"],
+                    value="Fast (greedy)",
+                    label="Quality",
+                    info="Greedy decoding is up to ~2x faster on CPU; beam search may help on noisy audio."
+                )
+
+                parallel_post = gr.Checkbox(
+                    value=True,
+                    label="Parallel post-processing",
+                    info="Run alignment and diarization at the same time. Disable on machines with few cores."
+                )
                 
                 # Show different UI based on whether token is in .env
                 if token_from_env:
@@ -361,6 +762,15 @@ def create_ui():
                     label="CPU Threads",
                     info="Number of CPU threads for processing"
                 )
+
+                batch_size = gr.Slider(
+                    minimum=1,
+                    maximum=32,
+                    value=8,
+                    step=1,
+                    label="Batch Size",
+                    info="30s chunks transcribed at once. Higher is faster on long files but uses more RAM. Try 16 on GPU."
+                )
                 
                 transcribe_btn = gr.Button(
                     "🚀 Transcribe",
@@ -402,7 +812,11 @@ def create_ui():
                 hf_token,
                 min_speakers,
                 max_speakers,
-                num_threads
+                num_threads,
+                batch_size,
+                language_dropdown,
+                quality_radio,
+                parallel_post
             ],
             outputs=[output_text, output_file]
         )
@@ -412,6 +826,8 @@ def create_ui():
 
 if __name__ == "__main__":
     app = create_ui()
+    # Let as many queued requests run as the shared model has CT2 workers
+    app.queue(default_concurrency_limit=CT2_NUM_WORKERS)
     app.launch(
         server_name="0.0.0.0",  # Allow external connections
         server_port=7860,